@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""Hybrid ridge + kNN temperature model.
+
+Reads a JSON payload on stdin with historical training samples and the
+feature row for the target day, blends a ridge regression, a kNN lookup
+and the raw forecast baseline into calibrated high/low predictions, and
+writes a JSON result on stdout. Invoked as a subprocess by the
+TypeScript bot (see docs/ml_implementation_plan.md).
+
+Payload shape:
+    {
+      "training_data": [{"features": {...}, "actual_high": f, "actual_low": f}, ...],
+      "current": {<feature_key>: value, ...},
+      "seed": 42
+    }
+"""
+
+import json
+import math
+import sys
+
+import numpy as np
+from scipy.linalg import LinAlgError, cho_factor, cho_solve
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj):
+        return orjson.dumps(obj).decode()
+
+except ImportError:  # orjson is optional; stdlib json parses the same payloads
+    _loads = json.loads
+    _dumps = json.dumps
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional; NumPy paths below cover the fallback
+    NUMBA_AVAILABLE = False
+
+    def njit(**kwargs):
+        return lambda func: func
+
+FEATURE_KEYS = [
+    "baseline_high",
+    "baseline_low",
+    "humidity",
+    "wind_speed",
+    "pressure",
+    "cloud_cover",
+    "precip_prob",
+    "day_of_year_sin",
+    "day_of_year_cos",
+]
+
+RIDGE_ALPHA = 1.0
+DTYPE = np.float32
+KNN_K = 7
+CALIB_SPLIT = 0.25
+SIGMA_FLOOR = 1.5
+MIN_SAMPLES = 30
+KNN_WEIGHT_FLOOR = 1e-6
+
+
+def _row(features, keys):
+    """Feature row as a numeric list; non-numeric entries become NaN."""
+    return [
+        v if isinstance(v := features.get(key), (int, float)) else math.nan
+        for key in keys
+    ]
+
+
+def _prepare_all(samples, feature_keys):
+    """Extract the feature matrix and both target vectors in a single pass.
+
+    Builds plain numeric lists (anything non-numeric pre-substituted as
+    NaN via an isinstance check, which skips per-value try/except frames)
+    and lets a single np.array call do the float32 conversion, then drops
+    invalid rows with one vectorized NaN mask so X, y_high and y_low
+    always stay row-aligned.
+    """
+    if not samples:
+        empty = np.empty(0, dtype=DTYPE)
+        return np.empty((0, len(feature_keys)), dtype=DTYPE), empty, empty
+    X = np.array(
+        [_row(s.get("features") or {}, feature_keys) for s in samples], dtype=DTYPE
+    )
+    y_high = np.array(
+        [v if isinstance(v := s.get("actual_high"), (int, float)) else math.nan for s in samples],
+        dtype=DTYPE,
+    )
+    y_low = np.array(
+        [v if isinstance(v := s.get("actual_low"), (int, float)) else math.nan for s in samples],
+        dtype=DTYPE,
+    )
+    mask = ~(np.isnan(X).any(axis=1) | np.isnan(y_high) | np.isnan(y_low))
+    return X[mask], y_high[mask], y_low[mask]
+
+
+def _split_data(n, split, seed):
+    """Deterministic shuffled train/calibration index split over n rows."""
+    perm = np.random.default_rng(seed).permutation(n)
+    cut = max(1, int(n * (1.0 - split)))
+    return perm[:cut], perm[cut:]
+
+
+def _standardize(X):
+    """Column-wise z-score. Returns (Xs, means, stds); constant columns get std 1."""
+    means = X.mean(axis=0)
+    stds = X.std(axis=0, ddof=1)
+    stds = np.where(stds > 1e-9, stds, 1.0)
+    return (X - means) / stds, means, stds
+
+
+@njit(cache=True, fastmath=True)
+def _std_core(values):
+    # Welford's online algorithm: one pass, numerically stable.
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    for v in values:
+        n += 1
+        d = v - mean
+        mean += d / n
+        m2 += d * (v - mean)
+    return math.sqrt(m2 / (n - 1))
+
+
+def _std(values):
+    """Sample standard deviation of a sequence."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return 0.0
+    if NUMBA_AVAILABLE:
+        return float(_std_core(values))
+    return float(np.std(values, ddof=1))
+
+
+@njit(cache=True, fastmath=True)
+def _rmse_core(preds, actuals):
+    acc = 0.0
+    for i in range(preds.shape[0]):
+        d = preds[i] - actuals[i]
+        acc += d * d
+    return math.sqrt(acc / preds.shape[0])
+
+
+def _rmse(preds, actuals):
+    preds = np.asarray(preds, dtype=np.float64)
+    actuals = np.asarray(actuals, dtype=np.float64)
+    if len(preds) == 0:
+        return math.inf
+    if NUMBA_AVAILABLE:
+        return float(_rmse_core(preds, actuals))
+    return float(np.sqrt(np.mean((preds - actuals) ** 2)))
+
+
+def _solve_normal_equations(XtX, Xty):
+    """Solve the ridge normal equations via LAPACK Cholesky.
+
+    XtX + alpha*I is symmetric positive definite, so dposv does the job in
+    half the flops of LU. Falls back to least squares if the factorization
+    ever fails (e.g. a degenerate calibration split).
+    """
+    try:
+        factor = cho_factor(XtX, lower=True, check_finite=False)
+        return cho_solve(factor, Xty, check_finite=False)
+    except LinAlgError:
+        return np.linalg.lstsq(XtX, Xty, rcond=None)[0]
+
+
+def _ridge_fit_core(Xs, Y, alpha):
+    """Fit ridge on pre-standardized features; returns (weights, biases).
+
+    The Cholesky factorization of XtX + alpha*I does not depend on the
+    target, so a multi-column Y gets all weight vectors for the price of
+    one factorization. Standardization lives with the caller so the same
+    means/stds (and standardized matrices) feed both the ridge and kNN
+    paths without being recomputed.
+    """
+    n = Xs.shape[0]
+    Xb = np.c_[np.ones(n, dtype=Xs.dtype), Xs]
+    Xt = Xb.T
+    XtX = Xt @ Xb
+    XtX.flat[:: Xb.shape[1] + 1] += alpha
+    coeffs = _solve_normal_equations(XtX, Xt @ Y)
+    return coeffs[1:], coeffs[0]
+
+
+_PREDICTOR_CACHE = {}
+
+
+def _make_predictor(nfeat):
+    """exec-generate an unrolled single-row ridge predictor for nfeat features.
+
+    The current-point predict is a 9-element dot product, where the
+    per-call overhead of a NumPy matvec dominates the arithmetic.
+    Flattening the loop into straight-line float math via codegen removes
+    both the loop and the ufunc dispatch; the function is cached per
+    feature count since feature_keys rarely changes.
+    """
+    predictor = _PREDICTOR_CACHE.get(nfeat)
+    if predictor is None:
+        terms = " + ".join(f"w[{i}] * x[{i}]" for i in range(nfeat))
+        namespace = {}
+        exec(f"def p(x, w, b):\n    return b + {terms}\n", namespace)
+        predictor = _PREDICTOR_CACHE[nfeat] = namespace["p"]
+    return predictor
+
+
+def _knn_query(X_std, norms, y_high, y_low, x_std, k):
+    """kNN prediction of both targets for one standardized query row.
+
+    Reuses the precomputed calibration row norms through the identity
+    ||x_i - q||^2 = ||x_i||^2 + ||q||^2 - 2<x_i, q>, so the distances
+    cost one BLAS gemv instead of a broadcast over rows, and both targets
+    are gathered through the same neighbour indices.
+    """
+    n = len(norms)
+    k = min(k, n)
+    if k == n:
+        return float(y_high.mean()), float(y_low.mean())
+    d2 = norms + x_std @ x_std - 2.0 * (X_std @ x_std)
+    idx = np.argpartition(d2, k)[:k]
+    return float(y_high[idx].mean()), float(y_low[idx].mean())
+
+
+def _knn_calibrate(X_std, norms, y_high, y_low, k):
+    """kNN predictions for every calibration row against the full set.
+
+    Builds the NxN squared-distance matrix once via the Gram identity
+    ||a-b||^2 = ||a||^2 + ||b||^2 - 2<a,b> (one GEMM instead of N single
+    queries), then gathers both targets through the same neighbour index
+    matrix. `norms` holds the precomputed row squared norms of X_std so
+    callers can share them with other distance queries.
+    """
+    n = len(X_std)
+    k = min(k, n)
+    if k == n:
+        # Every row is a neighbour of every other: the prediction collapses
+        # to the global target mean, so skip the distance GEMM entirely.
+        return np.full(n, y_high.mean()), np.full(n, y_low.mean())
+    G = X_std @ X_std.T
+    D = norms[:, None] + norms[None, :] - 2.0 * G
+    idx = np.argpartition(D, k, axis=1)[:, :k]
+    return y_high[idx].mean(axis=1), y_low[idx].mean(axis=1)
+
+
+def _calc_weights(rmses):
+    """Inverse-RMSE ensemble weights, normalized to sum to one."""
+    inv = [1.0 / max(r, 1e-6) for r in rmses]
+    total = sum(inv)
+    return [v / total for v in inv]
+
+
+if NUMBA_AVAILABLE:
+    # Pay the JIT compilation cost once at import rather than on first use.
+    _warm_y = np.array([0.0, 1.0])
+    _std_core(_warm_y)
+    _rmse_core(_warm_y, _warm_y)
+    del _warm_y
+
+
+def run_model(training_data, current, seed=42, feature_keys=FEATURE_KEYS):
+    X_all, y_high_all, y_low_all = _prepare_all(training_data, feature_keys)
+
+    train_idx, calib_idx = _split_data(len(X_all), CALIB_SPLIT, seed)
+    X_train = X_all[train_idx]
+    y_high_train = y_high_all[train_idx]
+    y_low_train = y_low_all[train_idx]
+    X_calib = X_all[calib_idx]
+    y_high_calib = y_high_all[calib_idx]
+    y_low_calib = y_low_all[calib_idx]
+
+    if len(X_train) < 2 or len(X_calib) < 2:
+        raise ValueError("not enough clean samples after split")
+
+    Xs_train, means, stds = _standardize(X_train)
+    weights, biases = _ridge_fit_core(
+        Xs_train, np.column_stack([y_high_train, y_low_train]), RIDGE_ALPHA
+    )
+
+    X_calib_std = (X_calib - means) / stds
+    ridge_calib = biases + X_calib_std @ weights
+    ridge_high = ridge_calib[:, 0]
+    ridge_low = ridge_calib[:, 1]
+
+    calib_norms = np.einsum("ij,ij->i", X_calib_std, X_calib_std)
+    knn_high, knn_low = _knn_calibrate(
+        X_calib_std, calib_norms, y_high_calib, y_low_calib, KNN_K
+    )
+
+    idx_bh = feature_keys.index("baseline_high")
+    idx_bl = feature_keys.index("baseline_low")
+    baseline_high = X_calib[:, idx_bh]
+    baseline_low = X_calib[:, idx_bl]
+
+    w_high = _calc_weights(
+        [
+            _rmse(baseline_high, y_high_calib),
+            _rmse(ridge_high, y_high_calib),
+            _rmse(knn_high, y_high_calib),
+        ]
+    )
+    w_low = _calc_weights(
+        [
+            _rmse(baseline_low, y_low_calib),
+            _rmse(ridge_low, y_low_calib),
+            _rmse(knn_low, y_low_calib),
+        ]
+    )
+
+    # Blend and residuals fused into one pass over the calibration arrays:
+    # stack the component predictions and let a single matvec produce the
+    # ensemble, then subtract in place of per-row comprehensions.
+    P_high = np.column_stack([baseline_high, ridge_high, knn_high])
+    P_low = np.column_stack([baseline_low, ridge_low, knn_low])
+    residuals_high = y_high_calib - P_high @ np.asarray(w_high, dtype=P_high.dtype)
+    residuals_low = y_low_calib - P_low @ np.asarray(w_low, dtype=P_low.dtype)
+    sigma_high = max(_std(residuals_high), SIGMA_FLOOR)
+    sigma_low = max(_std(residuals_low), SIGMA_FLOOR)
+
+    x_current = np.asarray(_row(current, feature_keys), dtype=DTYPE)
+    if np.isnan(x_current).any():
+        raise ValueError("current feature row has missing values")
+
+    x_current_std = (x_current - means) / stds
+    predict_row = _make_predictor(len(feature_keys))
+    xs = x_current_std.tolist()
+    ridge_pred_high = predict_row(xs, weights[:, 0].tolist(), float(biases[0]))
+    ridge_pred_low = predict_row(xs, weights[:, 1].tolist(), float(biases[1]))
+    if w_high[2] > KNN_WEIGHT_FLOOR or w_low[2] > KNN_WEIGHT_FLOOR:
+        knn_pred_high, knn_pred_low = _knn_query(
+            X_calib_std, calib_norms, y_high_calib, y_low_calib, x_current_std, KNN_K
+        )
+    else:
+        # kNN weight is negligible; skip the query rather than compute a
+        # contribution that rounds away in the blend.
+        knn_pred_high = knn_pred_low = 0.0
+    base_pred_high = x_current[idx_bh]
+    base_pred_low = x_current[idx_bl]
+
+    high_mean = w_high[0] * base_pred_high + w_high[1] * ridge_pred_high + w_high[2] * knn_pred_high
+    low_mean = w_low[0] * base_pred_low + w_low[1] * ridge_pred_low + w_low[2] * knn_pred_low
+
+    return {
+        "high_mean": float(high_mean),
+        "high_std": float(sigma_high),
+        "low_mean": float(low_mean),
+        "low_std": float(sigma_low),
+        "model_weights": {
+            "high": {"baseline": w_high[0], "ridge": w_high[1], "knn": w_high[2]},
+            "low": {"baseline": w_low[0], "ridge": w_low[1], "knn": w_low[2]},
+        },
+        "n_train": int(len(X_train)),
+        "n_calib": int(len(X_calib)),
+    }
+
+
+def main():
+    payload = _loads(sys.stdin.buffer.read())
+    training_data = payload.get("training_data") or []
+    current = payload.get("current") or {}
+    seed = payload.get("seed", 42)
+
+    if len(training_data) < MIN_SAMPLES:
+        print(_dumps({"error": f"need at least {MIN_SAMPLES} training samples"}))
+        return 1
+
+    try:
+        result = run_model(training_data, current, seed=seed)
+    except ValueError as exc:
+        print(_dumps({"error": str(exc)}))
+        return 1
+
+    print(_dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())